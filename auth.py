@@ -1,14 +1,22 @@
-from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from datetime import timedelta
 from fastapi import Depends, HTTPException, status, APIRouter
 from fastapi.security import OAuth2PasswordRequestForm, HTTPBearer, HTTPAuthorizationCredentials
-from pymongo import MongoClient
-from bson import ObjectId
 from dotenv import load_dotenv
 from pymongo.errors import DuplicateKeyError
+from db import users_collection
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
 import os
 import re
+import threading
+import time
+import bcrypt
+import jwt
+from cachetools import TTLCache
+from concurrent.futures import ThreadPoolExecutor
 
 # ---------------------------
 # Load environment variables
@@ -19,7 +27,6 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
-MONGO_URI = os.getenv("MONGO_URI")
 
 # Fail fast if missing any .env values
 if os.getenv("GITHUB_ACTIONS") == "true":
@@ -27,44 +34,58 @@ if os.getenv("GITHUB_ACTIONS") == "true":
     SECRET_KEY = SECRET_KEY or "dummy_secret"
     ALGORITHM = ALGORITHM or "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES = ACCESS_TOKEN_EXPIRE_MINUTES or "60"
-    MONGO_URI = MONGO_URI or "mongodb://localhost:27017/testdb"
-    
+
 required_env_vars = {
     "SECRET_KEY": SECRET_KEY,
     "ALGORITHM": ALGORITHM,
     "ACCESS_TOKEN_EXPIRE_MINUTES": ACCESS_TOKEN_EXPIRE_MINUTES,
-    "MONGO_URI": MONGO_URI,
 }
 
 missing = [k for k, v in required_env_vars.items() if not v]
 if missing:
     raise ValueError(f"❌ Missing required environment variables: {', '.join(missing)}")
 
-# Convert token expiry to integer safely
+# Convert token expiry to integer safely (TypeError guards a None slipping
+# past the env checks above)
 try:
     ACCESS_TOKEN_EXPIRE_MINUTES = int(ACCESS_TOKEN_EXPIRE_MINUTES)
-except ValueError:
+except (TypeError, ValueError):
     raise ValueError("❌ ACCESS_TOKEN_EXPIRE_MINUTES must be an integer")
 
-# ---------------------------
-# Database connection (MongoDB)
-# ---------------------------
-client = MongoClient(MONGO_URI)
-db = client["cloudassets"]
-users_collection = db["users"]
+# Default token lifetime in seconds, precomputed once for create_access_token
+_DEFAULT_EXPIRE_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
 
-try:
-    users_collection.create_index("username", unique=True)
-    print("✅ Ensured unique index on 'username' field")
-except Exception as e:
-    print(f"⚠️ Could not create index on username: {e}")
+# The shared async client lives in db.py; index creation happens in the
+# app startup hook via db.ensure_indexes().
 
 # ---------------------------
 # Security Configuration
 # ---------------------------
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Bcrypt work factor, tunable per deployment (2^cost key-schedule iterations)
+try:
+    BCRYPT_COST = int(os.getenv("BCRYPT_COST", "12"))
+except ValueError:
+    raise ValueError("❌ BCRYPT_COST must be an integer")
+
+# Warm the bcrypt backend once so the first real request doesn't pay the
+# lazy-import cost (minimum rounds keep this cheap)
+bcrypt.hashpw(b"warmup", bcrypt.gensalt(rounds=4))
+
+# Dedicated pool for the ~100ms bcrypt calls so they never block the event
+# loop or compete with FastAPI's shared threadpool. bcrypt's C core releases
+# the GIL, so threads parallelize across cores (process pools are unusable
+# under Lambda's sandbox).
+_BCRYPT_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 2, thread_name_prefix="bcrypt")
+
 oauth2_scheme = HTTPBearer()
 
+# Compile validation patterns once at import instead of per request.
+# The username check searches for a *disallowed* byte: the complement class
+# lets the regex engine scan at C level instead of interpreting an anchored
+# match character by character.
+_USERNAME_BAD_BYTE = re.compile(rb"[^A-Za-z0-9_.@-]")
+_PASSWORD_SPECIALS = frozenset("@$!%*?&")
+
 # ---------------------------
 # FastAPI Router
 # ---------------------------
@@ -73,39 +94,71 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 # ---------------------------
 # Helper Functions
 # ---------------------------
+def _password_bytes(password: str) -> bytes:
+    """Encode a password for bcrypt, truncating past its 72-byte limit."""
+    # ASCII fast path: char length equals byte length, so a password within
+    # the limit needs no truncation slice. str.isascii() is an O(1) flag
+    # check in CPython and covers the overwhelming majority of passwords.
+    if len(password) <= 72 and password.isascii():
+        return password.encode("utf-8")
+    return password.encode("utf-8")[:72]
+
 def get_password_hash(password: str) -> str:
     """Hash a plain text password safely within bcrypt limits."""
-    if len(password.encode("utf-8")) > 72:
-        password = password[:72]  # bcrypt truncates past 72 bytes
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(rounds=BCRYPT_COST)).decode("utf-8")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password safely within bcrypt limits."""
-    if len(plain_password.encode("utf-8")) > 72:
-        plain_password = plain_password[:72]
-    return pwd_context.verify(plain_password, hashed_password)
+    return bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode("utf-8"))
+
+async def verify_password_batch(plains_and_hashes: list[tuple[str, str]]) -> list[bool]:
+    """Verify several (plain, hashed) pairs concurrently on the bcrypt pool.
+
+    Under a login storm the independent verifications run in parallel across
+    cores instead of serializing one request at a time.
+    """
+    loop = asyncio.get_running_loop()
+    futures = [
+        loop.run_in_executor(_BCRYPT_POOL, verify_password, plain, hashed)
+        for plain, hashed in plains_and_hashes
+    ]
+    return await asyncio.gather(*futures)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     """Generate a new JWT access token."""
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    # JWT "exp" is a numeric date, so plain integer math avoids building
+    # datetime/timedelta objects on every token mint
+    expire_seconds = int(expires_delta.total_seconds()) if expires_delta else _DEFAULT_EXPIRE_SECONDS
+    to_encode["exp"] = int(time.time()) + expire_seconds
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def validate_username(username: str):
+def validate_username(username: str) -> str:
     """Allow alphanumeric usernames with limited special characters."""
-    pattern = r"^[A-Za-z0-9_.@-]+$"
-    if not re.match(pattern, username):
+    try:
+        encoded = username.encode("ascii")
+    except UnicodeEncodeError:
+        encoded = None
+    if not encoded or _USERNAME_BAD_BYTE.search(encoded):
         raise HTTPException(
             status_code=400,
             detail="Username can only include letters, numbers, and _ . @ - characters."
         )
     return username
 
-def validate_password(password: str):
-    """Enforce password complexity."""
-    pattern = r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&]).{8,}$"
-    if not re.match(pattern, password):
+def validate_password(password: str) -> str:
+    """Enforce password complexity with a single pass over the string."""
+    has_lower = has_upper = has_digit = has_special = False
+    for char in password:
+        if "a" <= char <= "z":
+            has_lower = True
+        elif "A" <= char <= "Z":
+            has_upper = True
+        elif "0" <= char <= "9":
+            has_digit = True
+        elif char in _PASSWORD_SPECIALS:
+            has_special = True
+    if not (len(password) >= 8 and has_lower and has_upper and has_digit and has_special):
         raise HTTPException(
             status_code=400,
             detail=(
@@ -119,40 +172,119 @@ def validate_password(password: str):
 # API Routes
 # ---------------------------
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-def register_user(form_data: OAuth2PasswordRequestForm = Depends()):
+async def register_user(form_data: OAuth2PasswordRequestForm = Depends()):
     """Register a new user securely with validation."""
     username = validate_username(form_data.username)
     password = validate_password(form_data.password)
 
-    hashed_pw = get_password_hash(password)
+    loop = asyncio.get_running_loop()
+    hashed_pw = await loop.run_in_executor(_BCRYPT_POOL, get_password_hash, password)
 
     try:
-        users_collection.insert_one({"username": username, "password": hashed_pw})
+        await users_collection.insert_one({"username": username, "password": hashed_pw})
     except DuplicateKeyError:
         raise HTTPException(status_code=409, detail="Username already exists")
 
+    invalidate_user_cache(username)
+
     return {"message": f"✅ User '{username}' registered successfully"}
 
 @router.post("/token")
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """Authenticate and return a JWT token."""
     username = validate_username(form_data.username)
-    user = users_collection.find_one({"username": username})
-    if not user or not verify_password(form_data.password, user["password"]):
+    user = await get_user(username)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+
+    loop = asyncio.get_running_loop()
+    password_ok = await loop.run_in_executor(
+        _BCRYPT_POOL, verify_password, form_data.password, user["password"]
+    )
+    if not password_ok:
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(data={"sub": username}, expires_delta=access_token_expires)
     return {"access_token": access_token, "token_type": "bearer"}
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(oauth2_scheme)):
+# Specialized decoder for the fixed HS256 configuration: the HMAC key is
+# prepared once at import and the header is never re-parsed — the signature
+# is checked against our own key regardless of what the header claims, so
+# algorithm negotiation is skipped entirely. Other configured algorithms
+# fall back to the generic PyJWT path.
+_HS256_KEY = SECRET_KEY.encode("utf-8") if ALGORITHM == "HS256" else None
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+def _decode_token(token: str) -> dict:
+    """Verify a JWT and return its payload, raising jwt.InvalidTokenError."""
+    if _HS256_KEY is None:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    try:
+        signing_input, _, signature_b64 = token.rpartition(".")
+        digest = hmac.new(_HS256_KEY, signing_input.encode("ascii"), hashlib.sha256).digest()
+        if not signing_input or not hmac.compare_digest(digest, _b64url_decode(signature_b64)):
+            raise jwt.InvalidTokenError("Signature verification failed")
+        payload = json.loads(_b64url_decode(signing_input.split(".", 1)[1]))
+        exp = payload.get("exp")
+        if exp is not None and exp <= time.time():
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        return payload
+    except jwt.InvalidTokenError:
+        raise
+    except (ValueError, TypeError, IndexError):
+        raise jwt.InvalidTokenError("Invalid token")
+
+# Decoded-token cache: a token presented repeatedly in a burst (e.g. an SPA
+# polling) skips the HMAC verification and payload parse on cache hits.
+# Only successful decodes are cached; entries age out via the TTL.
+_TOKEN_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+_TOKEN_CACHE_LOCK = threading.Lock()
+
+# Short-TTL cache of user documents for the login path: repeated attempts
+# against one username (e.g. a credential-stuffing burst) skip the Mongo
+# round-trip and only pay the bcrypt cost. Missing users are never cached,
+# so a fresh registration is visible immediately and enumeration timing
+# isn't skewed by long-lived negative entries.
+_USER_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+_USER_CACHE_LOCK = threading.Lock()
+
+async def get_user(username: str) -> dict | None:
+    """Fetch a user document, consulting the short-TTL login cache first."""
+    with _USER_CACHE_LOCK:
+        user = _USER_CACHE.get(username)
+    if user is not None:
+        return user
+    user = await users_collection.find_one({"username": username})
+    if user is not None:
+        with _USER_CACHE_LOCK:
+            _USER_CACHE[username] = user
+    return user
+
+def invalidate_user_cache(username: str) -> None:
+    """Drop a cached user document after registration or credential change."""
+    with _USER_CACHE_LOCK:
+        _USER_CACHE.pop(username, None)
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(oauth2_scheme)) -> str:
     """Decode and verify JWT to identify the current user."""
+    token = credentials.credentials
+    with _TOKEN_CACHE_LOCK:
+        cached = _TOKEN_CACHE.get(token)
+    if cached is not None:
+        username, exp = cached
+        if exp is None or exp > time.time():
+            return username
+
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = _decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid authentication token")
+        with _TOKEN_CACHE_LOCK:
+            _TOKEN_CACHE[token] = (username, payload.get("exp"))
         return username
-    except JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
@@ -0,0 +1,63 @@
+import os
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+from dotenv import load_dotenv
+
+# ---------------------------
+# Load environment variables
+# ---------------------------
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+
+if os.getenv("GITHUB_ACTIONS") == "true":
+    MONGO_URI = MONGO_URI or "mongodb://localhost:27017/testdb"
+
+if not MONGO_URI:
+    raise ValueError("❌ Missing required environment variable: MONGO_URI")
+
+# ---------------------------
+# Shared database connection (MongoDB)
+# ---------------------------
+# One async client per process: motor pools connections internally, so every
+# module importing from here reuses the same TCP/TLS sessions instead of
+# paying a fresh handshake per client, and queries multiplex on the event
+# loop instead of parking a thread each.
+client = AsyncIOMotorClient(
+    MONGO_URI,
+    maxPoolSize=200,
+    minPoolSize=20,
+    serverSelectionTimeoutMS=2000,
+    socketTimeoutMS=5000,
+    compressors="zstd",  # shrinks list_assets payloads on the wire
+    retryWrites=True,
+    appname="cloud-asset-api",  # tag connections for server-side profiling
+)
+db = client["cloudassets"]
+users_collection = db["users"]
+assets_collection = db["assets"]
+
+
+async def ensure_indexes():
+    """Ping the deployment and build the indexes the API relies on.
+
+    Called from the FastAPI startup hook — motor needs a running event loop,
+    so this can't happen at import time anymore.
+    """
+    await client.admin.command("ping")
+    print("✅ Successfully connected to MongoDB Atlas")
+
+    try:
+        await users_collection.create_index("username", unique=True)
+        print("✅ Ensured unique index on 'username' field")
+    except PyMongoError as e:
+        print(f"⚠️ Could not create index on username: {e}")
+
+    # Every asset query filters on owner, so index it to avoid collection
+    # scans. background=True keeps builds from blocking existing deployments.
+    try:
+        await assets_collection.create_index([("owner", 1), ("_id", 1)], background=True)
+        await assets_collection.create_index([("owner", 1), ("type", 1)], background=True)
+        print("✅ Ensured indexes on 'assets' collection")
+    except PyMongoError as e:
+        print(f"⚠️ Could not create indexes on assets: {e}")
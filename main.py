@@ -1,16 +1,17 @@
 import os
 from fastapi import FastAPI, HTTPException, status, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient
+from fastapi.responses import ORJSONResponse
 from pymongo.errors import PyMongoError
 from bson import ObjectId
 from pydantic import BaseModel, Field
-from typing import List
 from dotenv import load_dotenv
 
 # Import authentication utilities and router
 from auth import router as auth_router, get_current_user
-from auth import MONGO_URI
+
+# Shared async MongoDB client (single pool per process, see db.py)
+from db import assets_collection, ensure_indexes
 
 # ----------------------------
 # Load environment variables
@@ -20,7 +21,8 @@ load_dotenv()
 app = FastAPI(
     title="Cloud Asset Metadata API",
     description="Manage cloud asset metadata (EC2, S3, etc.) with REST API and JWT authentication",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse,  # Rust-backed serializer for large list responses
 )
 
 app.add_middleware(
@@ -34,18 +36,13 @@ app.add_middleware(
 # ----------------------------
 # Database Connection
 # ----------------------------
-if not MONGO_URI:
-    raise ValueError("❌ MONGO_URI environment variable is not set")
-
-try:
-    client = MongoClient(MONGO_URI)
-    db = client["cloudassets"]
-    assets_collection = db["assets"]
-    client.admin.command("ping")
-    print("✅ Successfully connected to MongoDB Atlas")
-except PyMongoError as e:
-    print(f"❌ Error connecting to MongoDB: {e}")
-    raise
+@app.on_event("startup")
+async def connect_db():
+    try:
+        await ensure_indexes()
+    except PyMongoError as e:
+        print(f"❌ Error connecting to MongoDB: {e}")
+        raise
 
 # ----------------------------
 # Models
@@ -76,9 +73,8 @@ class AssetResponse(BaseModel):
 # Helper Function
 # ----------------------------
 def convert_objectid(asset: dict) -> dict:
-    if asset and "_id" in asset:
-        asset["id"] = str(asset["_id"])
-        del asset["_id"]
+    # Callers only pass non-empty documents, so pop the _id in one operation
+    asset["id"] = str(asset.pop("_id"))
     return asset
 
 # ----------------------------
@@ -106,35 +102,54 @@ app.include_router(auth_router)
 # ----------------------------
 # Protected Asset Endpoints
 # ----------------------------
-@app.post("/assets", response_model=AssetResponse, status_code=status.HTTP_201_CREATED)
-def create_asset(asset: AssetCreate, current_user: str = Depends(get_current_user)):
+# response_model=None on the write/list paths skips a redundant Pydantic
+# validation pass: the returned documents are server-generated (request body
+# already validated by AssetCreate, ids minted by Mongo) and pre-shaped to
+# match what AssetResponse would serialize to.
+@app.post("/assets", response_model=None, status_code=status.HTTP_201_CREATED)
+async def create_asset(asset: AssetCreate, current_user: str = Depends(get_current_user)):
     try:
-        asset_dict = asset.dict()
+        asset_dict = asset.model_dump()
         asset_dict["owner"] = current_user  # Assign owner dynamically
-        result = assets_collection.insert_one(asset_dict)
+        result = await assets_collection.insert_one(asset_dict)
 
-        created_asset = assets_collection.find_one({"_id": result.inserted_id})
-        return convert_objectid(created_asset)
+        # insert_one only adds _id, so echo the document we already have
+        # instead of re-fetching it from Mongo
+        asset_dict["id"] = str(result.inserted_id)
+        asset_dict.pop("_id", None)
+        return asset_dict
     except PyMongoError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
-@app.get("/assets", response_model=List[AssetResponse])
-def list_assets(current_user: str = Depends(get_current_user)):
+@app.get("/assets", response_model=None)
+async def list_assets(current_user: str = Depends(get_current_user)):
     try:
-        assets = list(assets_collection.find({"owner": current_user}))
-        return [convert_objectid(asset) for asset in assets]
+        # $toString casts the ObjectId server-side, so no per-document
+        # convert_objectid pass is needed in Python
+        cursor = assets_collection.aggregate([
+            {"$match": {"owner": current_user}},
+            {"$project": {
+                "_id": 0,
+                "id": {"$toString": "$_id"},
+                "name": 1,
+                "owner": 1,
+                "type": 1,
+                "region": 1,
+            }},
+        ])
+        return await cursor.to_list(length=None)
     except PyMongoError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/assets/{id}", response_model=AssetResponse)
-def get_asset(id: str, current_user: str = Depends(get_current_user)):
+async def get_asset(id: str, current_user: str = Depends(get_current_user)):
     try:
         if not ObjectId.is_valid(id):
             raise HTTPException(status_code=400, detail="Invalid asset ID format")
 
-        asset = assets_collection.find_one({"_id": ObjectId(id), "owner": current_user})
+        asset = await assets_collection.find_one({"_id": ObjectId(id), "owner": current_user})
         if not asset:
             raise HTTPException(status_code=404, detail="Asset not found or unauthorized access")
 
@@ -144,12 +159,12 @@ def get_asset(id: str, current_user: str = Depends(get_current_user)):
 
 
 @app.delete("/assets/{id}")
-def delete_asset(id: str, current_user: str = Depends(get_current_user)):
+async def delete_asset(id: str, current_user: str = Depends(get_current_user)):
     try:
         if not ObjectId.is_valid(id):
             raise HTTPException(status_code=400, detail="Invalid asset ID format")
 
-        result = assets_collection.delete_one({"_id": ObjectId(id), "owner": current_user})
+        result = await assets_collection.delete_one({"_id": ObjectId(id), "owner": current_user})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Asset not found or unauthorized deletion")
 